@@ -0,0 +1,347 @@
+import os
+import json
+import logging
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+
+# SOAK TEST SETUP
+# Replaces the production settings before weather_functions is imported, so a soak run
+# never needs the real .env and never touches the real logs, token or receiving server
+SOAK_ENVIRONMENT = {
+    "SECRET_TOKEN_WEATHERBOT": "000000000:soak-test-token",
+    "CHAT_ID_PERSON_1": "",
+    "CHAT_ID_PERSON_2": "",
+    "SSHKEY": "/dev/null",
+    "RECEIVING_SERVER": "localhost:22",
+    "RECEIVING_FILE_PATH": "/dev/null",
+    "LOG_DIRECTORY": os.path.join(tempfile.gettempdir(), "weather_soak"),
+    "LOG_FILE_NAME": "weather_soak.log",
+    "KNMI_API_KEY": "soak-test-key",
+    "KNMI_LOCATION_CODE": "52.37,4.89",
+    "WEATHER_JSON_FILE_PATH": tempfile.gettempdir(),
+    "UV_API_KEY": "soak-test-key",
+    "UV_API_BACKUP_KEY": "soak-test-key",
+}
+
+# Synthetic subscribers get chat IDs from this offset so they never collide with real ones
+SYNTHETIC_CHAT_ID_OFFSET = 900000000
+
+STUB_KNMI_DATA = {
+    "liveweer": [{
+        "plaats": "Soak test",
+        "time": "01-01-2024 12:00",
+        "temp": "12.3",
+        "gtemp": "10.1",
+        "samenv": "Half bewolkt",
+        "lv": "78",
+        "windr": "ZW",
+        "windkmh": "18",
+        "verw": "Wisselend bewolkt en droog",
+        "sup": "08:45",
+        "sunder": "16:38",
+        "image": "halfbewolkt",
+        "d0weer": "halfbewolkt",
+        "d0tmax": "13",
+        "d0tmin": "7",
+        "d0neerslag": "20",
+        "d0zon": "40",
+        "d1weer": "regen",
+        "d1tmax": "11",
+        "d1tmin": "6",
+        "d1neerslag": "80",
+        "d1zon": "10",
+        "alarmtxt": ""
+    }]
+}
+
+STUB_UV_DATA = {
+    "result": {
+        "uv": 2.1,
+        "uv_max": 3.4,
+        "uv_max_time": "2024-01-01T11:42:27.123Z",
+        "safe_exposure_time": {
+            "st1": 80
+        }
+    }
+}
+
+
+class StubResponse:
+    """Minimal stand-in for requests.Response, returned by the stubbed upstream APIs."""
+
+    def __init__(self, data):
+        self.status_code = 200
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(json.dumps(self._data))
+
+
+def count_open_file_descriptors():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def count_child_processes():
+    # Zombies from unreaped scp runs still show up here, which is what we want to catch
+    own_pid = str(os.getpid())
+    child_count = 0
+    try:
+        process_ids = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+
+    for process_id in process_ids:
+        try:
+            with open(f"/proc/{process_id}/stat", "r") as stat_file:
+                stat_fields = stat_file.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if stat_fields[1] == own_pid:
+            child_count += 1
+
+    return child_count
+
+
+def get_resident_memory_kb():
+    try:
+        with open("/proc/self/status", "r") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def get_log_file_size(log_file_path):
+    if os.path.exists(log_file_path):
+        return os.path.getsize(log_file_path)
+    return 0
+
+
+def get_heap_bytes():
+    # Leave out the soak harness itself, the list of samples grows with every slot
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, __file__)])
+    return sum(trace.size for trace in snapshot.traces)
+
+
+def take_sample(slot, log_file_path):
+    heap_current, heap_peak = tracemalloc.get_traced_memory()
+    return {
+        "slot": slot,
+        "rss_kb": get_resident_memory_kb(),
+        "heap_bytes": get_heap_bytes(),
+        "heap_peak_bytes": heap_peak,
+        "open_fds": count_open_file_descriptors(),
+        "child_processes": count_child_processes(),
+        "log_bytes": get_log_file_size(log_file_path),
+    }
+
+
+def create_synthetic_subscribers(subscribers):
+    synthetic_users = [str(SYNTHETIC_CHAT_ID_OFFSET + number) for number in range(subscribers)]
+
+    os.makedirs("./users_lists", exist_ok=True)
+    for users_file_name in ["users_summary.txt", "users_details.txt"]:
+        with open(os.path.join("./users_lists", users_file_name), "w") as users_file:
+            users_file.write("\n".join(synthetic_users))
+
+    return synthetic_users
+
+
+GROWTH_KEYS = ["rss_kb", "heap_bytes", "open_fds", "child_processes", "log_bytes"]
+
+
+def sample_growth(first_sample, last_sample):
+    growth = {}
+    for key in GROWTH_KEYS:
+        if first_sample[key] is None or last_sample[key] is None:
+            growth[key] = None
+        else:
+            growth[key] = last_sample[key] - first_sample[key]
+    return growth
+
+
+def create_report(samples, day_end_samples, upstream_calls, subscribers, days, duration, log_file_size):
+    # samples[0] is taken before the warm-up slot, samples[1] right after it. Growth is
+    # measured from samples[1] on, so one-time start-up costs don't look like a leak.
+    warm_up_sample = samples[1]
+    last_sample = samples[-1]
+
+    daily_growth = []
+    previous_sample = warm_up_sample
+    for day_end_sample in day_end_samples:
+        daily_growth.append(sample_growth(previous_sample, day_end_sample))
+        previous_sample = day_end_sample
+
+    # Day 1 still settles caches, so the steady growth rate is taken from the later days
+    steady_growth_per_day = None
+    if days > 1:
+        steady_growth_per_day = {}
+        for key, growth in sample_growth(day_end_samples[0], day_end_samples[-1]).items():
+            steady_growth_per_day[key] = None if growth is None else round(growth / (days - 1), 1)
+
+    return {
+        "subscribers": subscribers,
+        "days": days,
+        "slots": len(samples) - 2,
+        "duration_seconds": round(duration, 2),
+        "upstream_calls": upstream_calls,
+        "warm_up_cost": sample_growth(samples[0], warm_up_sample),
+        "total_growth": sample_growth(warm_up_sample, last_sample),
+        "daily_growth": daily_growth,
+        "steady_growth_per_day": steady_growth_per_day,
+        "heap_peak_bytes": max(sample["heap_peak_bytes"] for sample in samples),
+        "child_processes_left": last_sample["child_processes"],
+        "log_file_bytes": log_file_size,
+        "samples": samples,
+    }
+
+
+def format_growth(growth):
+    return (f"RSS {growth['rss_kb']} kB, heap {growth['heap_bytes']} bytes, "
+            f"fds {growth['open_fds']}, child processes {growth['child_processes']}, "
+            f"log {growth['log_bytes']} bytes")
+
+
+def format_report(report):
+    lines = [
+        "Soak test report",
+        f"Subscribers: {report['subscribers']}",
+        f"Days: {report['days']} ({report['slots']} slots in {report['duration_seconds']} s)",
+        f"Warm-up cost: {format_growth(report['warm_up_cost'])}",
+        f"Growth after warm-up: {format_growth(report['total_growth'])}",
+    ]
+    for day, growth in enumerate(report["daily_growth"], start=1):
+        lines.append(f"  Day {day}: {format_growth(growth)}")
+
+    if report["steady_growth_per_day"] is None:
+        lines.append("Steady growth per day: run at least 2 days to tell a leak from one-time costs")
+    else:
+        lines.append(f"Steady growth per day (after day 1): {format_growth(report['steady_growth_per_day'])}")
+
+    lines += [
+        f"Python heap peak: {report['heap_peak_bytes']} bytes",
+        f"Child processes left: {report['child_processes_left']}",
+        f"Log file size: {report['log_file_bytes']} bytes",
+        "Upstream calls:",
+    ]
+    for upstream, calls in report["upstream_calls"].items():
+        lines.append(f"  {upstream}: {calls}")
+
+    return "\n".join(lines)
+
+
+def swap_log_file_handlers(log_file_path):
+    """Send the root logger's file output to log_file_path. Returns the handlers to restore."""
+    root_logger = logging.getLogger()
+    original_handlers = [handler for handler in root_logger.handlers if isinstance(handler, logging.FileHandler)]
+
+    soak_handler = logging.FileHandler(log_file_path)
+    if original_handlers:
+        soak_handler.setFormatter(original_handlers[0].formatter)
+        soak_handler.setLevel(original_handlers[0].level)
+    else:
+        soak_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    for handler in original_handlers:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(soak_handler)
+
+    return soak_handler, original_handlers
+
+
+def restore_log_file_handlers(soak_handler, original_handlers):
+    root_logger = logging.getLogger()
+    root_logger.removeHandler(soak_handler)
+    soak_handler.close()
+    for handler in original_handlers:
+        root_logger.addHandler(handler)
+
+
+def run_soak_test(weather_update, intervals, kind_of_update_for_interval, subscribers, days=1, slot_delay=0, report_path=None):
+    """Run the half-hourly broadcast cycle against local stubs and report resource growth per day.
+
+    Every KNMI/OpenUV request, Telegram message and scp transfer is stubbed out, but the
+    scp path still spawns a real (no-op) shell process so descriptor and process leaks show up.
+    Logging goes to a throwaway file for the length of the run.
+    """
+    # Imported here so SOAK_ENVIRONMENT is in place before weather_functions reads it
+    import weather_functions
+
+    upstream_calls = {"knmi": 0, "openuv": 0, "telegram": 0, "scp": 0}
+    run_subprocess = subprocess.run
+
+    def stub_requests_get(url, *args, **kwargs):
+        if "openuv" in url:
+            upstream_calls["openuv"] += 1
+            return StubResponse(STUB_UV_DATA)
+        upstream_calls["knmi"] += 1
+        return StubResponse(STUB_KNMI_DATA)
+
+    def stub_send_message(*args, **kwargs):
+        upstream_calls["telegram"] += 1
+
+    def stub_subprocess_run(command, *args, **kwargs):
+        upstream_calls["scp"] += 1
+        return run_subprocess("true", *args, **kwargs)
+
+    original_working_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix="weather_soak_") as soak_directory:
+        log_file_path = os.path.join(soak_directory, "weather_soak.log")
+        soak_handler, original_handlers = swap_log_file_handlers(log_file_path)
+
+        # The update cycle reads and writes relative to the working directory
+        os.chdir(soak_directory)
+        try:
+            logging.info(f"Soak test started with {subscribers} subscribers for {days} day(s).")
+            synthetic_users = create_synthetic_subscribers(subscribers)
+
+            with mock.patch.object(weather_functions.requests, "get", stub_requests_get), \
+                    mock.patch.object(weather_functions.bot, "send_message", stub_send_message), \
+                    mock.patch.object(weather_functions.subprocess, "run", stub_subprocess_run), \
+                    mock.patch.object(weather_functions, "AUTORIZED_USERS", synthetic_users), \
+                    mock.patch.object(weather_functions, "WEATHER_JSON_FILE_PATH", soak_directory):
+                tracemalloc.start()
+                start_time = time.monotonic()
+                samples = [take_sample("before warm-up", log_file_path)]
+
+                # Same as the daemon on start-up; this slot is the baseline, not part of the growth
+                weather_update("details")
+                samples.append(take_sample("warm-up", log_file_path))
+
+                day_end_samples = []
+                for day in range(days):
+                    for interval in intervals:
+                        weather_update(kind_of_update_for_interval(interval))
+                        samples.append(take_sample(f"day {day + 1} {interval}", log_file_path))
+                        time.sleep(slot_delay)
+                    day_end_samples.append(samples[-1])
+
+                duration = time.monotonic() - start_time
+                tracemalloc.stop()
+
+            logging.info("Soak test ended.")
+            log_file_size = get_log_file_size(log_file_path)
+        finally:
+            os.chdir(original_working_directory)
+            restore_log_file_handlers(soak_handler, original_handlers)
+
+    report = create_report(samples, day_end_samples, upstream_calls, subscribers, days, duration, log_file_size)
+
+    if report_path:
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    return report
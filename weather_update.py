@@ -1,4 +1,6 @@
 import os
+import sys
+import argparse
 import logging
 from logging.handlers import TimedRotatingFileHandler
 import schedule
@@ -6,11 +8,41 @@ from dotenv import load_dotenv
 import telebot
 import time
 from cryptography.fernet import Fernet, InvalidToken
-import weather_functions
 
 load_dotenv()
 
 
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def non_negative_float(value):
+    number = float(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {value}")
+    return number
+
+
+parser = argparse.ArgumentParser(description="Send scheduled weather updates.")
+subparsers = parser.add_subparsers(dest="mode")
+soak_parser = subparsers.add_parser("soak", help="Simulate the daily schedule in compressed time against local stubs.")
+soak_parser.add_argument("--subscribers", type=positive_int, default=2, help="Number of synthetic subscribers.")
+soak_parser.add_argument("--days", type=positive_int, default=1, help="Number of simulated days.")
+soak_parser.add_argument("--slot-delay", type=non_negative_float, default=0, help="Seconds to wait between simulated slots.")
+soak_parser.add_argument("--report", help="Path to write the full JSON report to.")
+args = parser.parse_args()
+
+if args.mode == "soak":
+    import weather_soak
+    # Must happen before weather_functions is imported, it reads these at import time
+    os.environ.update(weather_soak.SOAK_ENVIRONMENT)
+
+import weather_functions
+
+
 # ENV VARIABLES
 SECRET_TOKEN_WEATHERBOT = os.getenv("SECRET_TOKEN_WEATHERBOT")
 
@@ -35,18 +67,6 @@ KNMI_LOCATION_CODE = os.getenv("KNMI_LOCATION_CODE")
 
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
 
-# Create users list directory
-if not os.path.exists("/users_lists"):
-    os.makedirs("/users_lists")
-
-# Create users_details.txt and users_summary.txt if they don't exist
-if not os.path.exists("/users_lists/users_details.txt"):
-    with open("/users_lists/users_details.txt", "w") as users_details_file:
-        users_details_file.write("")
-if not os.path.exists("/users_lists/users_summary.txt"):
-    with open("/users_lists/users_summary.txt", "w") as users_summary_file:
-        users_summary_file.write("")
-
 
 def weather_update(kind_of_update):
     logging.debug(f"Weather update {kind_of_update} function started.")
@@ -72,16 +92,38 @@ def weather_update(kind_of_update):
     logging.info("-----------------------------------------------------------------------------------------------")
 
 
-weather_update("details")
+def kind_of_update_for_interval(interval):
+    if interval == "05:58" or interval == "11:58" or interval == "14.58" or interval == "17:58" or interval == "21:58":
+        return "details"
+    else:
+        return "summary"
+
 
 # Generate a list of 30-minute intervals starting from 
 thirty_minute_intervals = ["{:02d}:{:02d}".format(hour, minute) for hour in range(0, 24) for minute in range(28, 60, 30)]
 
+if args.mode == "soak":
+    report = weather_soak.run_soak_test(weather_update, thirty_minute_intervals, kind_of_update_for_interval,
+                                        args.subscribers, args.days, args.slot_delay, args.report)
+    print(weather_soak.format_report(report))
+    sys.exit(0)
+
+# Create users list directory
+if not os.path.exists("/users_lists"):
+    os.makedirs("/users_lists")
+
+# Create users_details.txt and users_summary.txt if they don't exist
+if not os.path.exists("/users_lists/users_details.txt"):
+    with open("/users_lists/users_details.txt", "w") as users_details_file:
+        users_details_file.write("")
+if not os.path.exists("/users_lists/users_summary.txt"):
+    with open("/users_lists/users_summary.txt", "w") as users_summary_file:
+        users_summary_file.write("")
+
+weather_update("details")
+
 for interval in thirty_minute_intervals:
-    if interval == "05:58" or interval == "11:58" or interval == "14.58" or interval == "17:58" or interval == "21:58":
-        schedule.every().day.at(interval).do(weather_update, "details")
-    else:
-        schedule.every().day.at(interval).do(weather_update, "summary")
+    schedule.every().day.at(interval).do(weather_update, kind_of_update_for_interval(interval))
 
 while True:
     schedule.run_pending()